@@ -0,0 +1,86 @@
+"""
+Shared fixtures for the DatabaseManager tests
+
+The database tests run against throwaway clusters started with sandbox_benchmarks.LocalPostgres, which
+needs initdb and pg_ctl on PATH or in PG_BIN and a non-root user, since initdb refuses to run as root.
+Where that is not possible, e.g. in a CI container running as root, set TEST_DATABASE_URL to a superuser
+URL of an existing server: every test then gets its own database there, and only the replication tests,
+which clone the cluster, are skipped.
+"""
+
+import os
+import shutil
+import sys
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import create_engine, make_url
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sandbox_benchmarks import LocalPostgres  # noqa: E402
+
+
+def _find_binary(name):
+    bin_dir = os.getenv("PG_BIN")
+    if bin_dir:
+        return os.path.exists(os.path.join(bin_dir, name))
+    return shutil.which(name) is not None
+
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+can_start_clusters = (
+    all(_find_binary(name) for name in ("initdb", "pg_ctl")) and getattr(os, "geteuid", lambda: 1)() != 0
+)
+
+requires_postgres = pytest.mark.skipif(
+    not (TEST_DATABASE_URL or can_start_clusters),
+    reason="needs TEST_DATABASE_URL, or initdb and pg_ctl on PATH or in PG_BIN and a non-root user",
+)
+
+requires_local_postgres = pytest.mark.skipif(
+    bool(TEST_DATABASE_URL) or not can_start_clusters,
+    reason="needs initdb and pg_ctl on PATH or in PG_BIN, a non-root user and TEST_DATABASE_URL unset",
+)
+
+
+def create_database(cluster):
+    """Create an empty database in a LocalPostgres cluster and return its URL"""
+    name = f"test_{uuid4().hex[:12]}"
+    engine = create_engine(cluster.url, isolation_level="AUTOCOMMIT")
+    try:
+        with engine.connect() as connection:
+            connection.exec_driver_sql(f"CREATE DATABASE {name}")
+    finally:
+        engine.dispose()
+    return make_url(cluster.url).set(database=name).render_as_string(hide_password=False)
+
+
+def drop_database(cluster, url):
+    """Drop a database made by create_database(), closing any connections a test left open"""
+    engine = create_engine(cluster.url, isolation_level="AUTOCOMMIT")
+    try:
+        with engine.connect() as connection:
+            connection.exec_driver_sql(f"DROP DATABASE IF EXISTS {make_url(url).database} WITH (FORCE)")
+    finally:
+        engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def postgres():
+    """Postgres server shared by the whole test session, TEST_DATABASE_URL or a local cluster"""
+    if TEST_DATABASE_URL:
+        yield SimpleNamespace(url=TEST_DATABASE_URL)
+        return
+    with LocalPostgres() as cluster:
+        yield cluster
+
+
+@pytest.fixture
+def database_url(postgres):
+    """URL of a new, empty database in the session server, dropped after the test"""
+    url = create_database(postgres)
+    yield url
+    drop_database(postgres, url)
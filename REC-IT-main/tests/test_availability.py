@@ -0,0 +1,67 @@
+"""
+Equipment availability: the in-memory AvailabilityIndex, kept current by the manager's checkouts and checkins
+"""
+
+import pytest
+
+from conftest import requires_postgres
+from sandbox_api_connections import AvailabilityIndex, DatabaseManager, EquipmentItem
+
+
+def test_availability_index():
+    index = AvailabilityIndex([
+        EquipmentItem("band1", "Resistance band", True),
+        EquipmentItem("band2", "Resistance band", False),
+        EquipmentItem("ball1", "Medicine ball", True),
+    ])
+    assert index.available("Resistance band") == ["band1"]
+    assert index.counts() == {
+        "Resistance band": {"available": 1, "total": 2},
+        "Medicine ball": {"available": 1, "total": 1},
+    }
+    assert index.set_available("band2", True)
+    assert index.available("Resistance band") == ["band1", "band2"]
+    assert not index.set_available("unknown", True)
+    index.set("ball1", "Kettlebell", False)
+    index.remove("band1")
+    assert index.counts() == {
+        "Resistance band": {"available": 1, "total": 1},
+        "Kettlebell": {"available": 0, "total": 1},
+    }
+    assert index.available("Medicine ball") == []
+
+
+@requires_postgres
+def test_checkouts_and_checkins_update_the_index_in_place(database_url):
+    # The index never expires, so only the write paths can change what it answers
+    db = DatabaseManager(database_url=database_url, index_ttl=None)
+    db.create_tables()
+    db.migrate_transaction_id_sequence()
+    for equipment_id, equipment_type in (("band1", "Resistance band"), ("band2", "Resistance band"),
+                                         ("ball1", "Medicine ball")):
+        db.add_equipment_item(equipment_id, equipment_type)
+    try:
+        assert db.get_available_by_type("Resistance band") == ["band1", "band2"]
+        index = db.availability_index
+
+        db.add_equipment_checkout("band1", 7)
+        assert db.get_available_by_type("Resistance band") == ["band2"]
+        with pytest.raises(ValueError, match="not available"):
+            db.add_equipment_checkout("band1", 8)
+        report = db.checkout_many([("band2", 8), ("ball1", 8)])
+        assert len(report["checkouts"]) == 2
+        assert db.availability_counts() == {
+            "Resistance band": {"available": 0, "total": 2},
+            "Medicine ball": {"available": 0, "total": 1},
+        }
+        db.checkin_equipment_item("band1")
+        db.checkin_many(["ball1"])
+        assert db.get_available_by_type("Resistance band") == ["band1"]
+        assert db.get_available_by_type("Medicine ball") == ["ball1"]
+        db.add_equipment_item("band3", "Resistance band")
+        assert db.get_available_by_type("Resistance band") == ["band1", "band3"]
+        # Still the index loaded at the start, updated in place
+        assert db.availability_index is index
+        assert db.load_availability_index().counts() == db.availability_counts()
+    finally:
+        db.dispose()
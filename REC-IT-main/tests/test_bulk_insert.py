@@ -0,0 +1,62 @@
+"""
+Bulk inserts: multi-row chunks, and the row-by-row retry that isolates rejected rows
+"""
+
+import pytest
+
+from conftest import requires_postgres
+from sandbox_api_connections import DatabaseManager
+
+pytestmark = requires_postgres
+
+
+@pytest.fixture
+def db(database_url):
+    manager = DatabaseManager(database_url=database_url)
+    manager.create_tables()
+    manager.add_user(3, "Grace", "Hopper")
+    yield manager
+    manager.dispose()
+
+
+def record_inserts(db, monkeypatch):
+    """Record the row IDs of every multi-row INSERT the manager sends"""
+    inserts = []
+    insert_many = db._insert_many
+
+    def recording_insert_many(connection, table_name, columns, data_dicts):
+        inserts.append([data["id"] for data in data_dicts])
+        insert_many(connection, table_name, columns, data_dicts)
+
+    monkeypatch.setattr(db, "_insert_many", recording_insert_many)
+    return inserts
+
+
+def test_failed_chunk_is_retried_row_by_row(db, monkeypatch):
+    inserts = record_inserts(db, monkeypatch)
+    report = db.add_users_bulk([
+        (1, "Ada", "Lovelace"),
+        (2, "Alan", "Turing"),
+        (3, "Grace", "Duplicate"),
+        ("4", "Bad", "Id"),
+        (5, "Edsger", "Dijkstra"),
+        (5, "Edsger", "Again"),
+        (6, "Barbara", "Liskov"),
+    ], chunk_size=2)
+    assert report["inserted"] == 4
+    assert [error["index"] for error in report["errors"]] == [2, 3, 5]
+    assert "duplicate key" in report["errors"][0]["error"]
+    assert "must be an integer" in report["errors"][1]["error"]
+    # Only the chunks holding a duplicate are retried, one row at a time
+    assert inserts == [[1, 2], [3, 5], [3], [5], [5, 6], [5], [6]]
+    assert sorted(user.id for user in db.get_all_users()) == [1, 2, 3, 5, 6]
+    assert db.get_user_by_id(3).user_last_name == "Hopper"
+    assert db.get_user_by_id(5).user_last_name == "Dijkstra"
+
+
+def test_clean_bulk_insert_sends_one_statement_per_chunk(db, monkeypatch):
+    inserts = record_inserts(db, monkeypatch)
+    report = db.add_equipment_items_bulk([(f"band{i}", "Resistance band") for i in range(5)], chunk_size=2)
+    assert report == {"inserted": 5, "errors": []}
+    assert inserts == [["band0", "band1"], ["band2", "band3"], ["band4"]]
+    assert len(db.get_available_by_type("Resistance band")) == 5
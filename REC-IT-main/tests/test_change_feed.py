@@ -0,0 +1,100 @@
+"""
+Change feed coherence: writes from another connection reach the caches and indexes of a DatabaseManager
+"""
+
+import time
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from conftest import requires_postgres
+from sandbox_api_connections import ChangeFeed, DatabaseManager
+
+
+def eventually(check, timeout=10):
+    """Poll check() until it returns a truthy value, failing after timeout seconds"""
+    deadline = time.monotonic() + timeout
+    while True:
+        value = check()
+        if value or time.monotonic() > deadline:
+            assert value, "condition not met in time"
+            return value
+        time.sleep(0.05)
+
+
+@pytest.fixture
+def db(database_url):
+    """Manager with caches and indexes that never expire on their own, so only the feed refreshes them"""
+    manager = DatabaseManager(database_url=database_url, cache_ttl=300, index_ttl=None)
+    manager.create_tables()
+    manager.install_change_feed()
+    manager.add_equipment_item("band1", "Resistance band")
+    manager.add_schedule_event("Yoga", "10:00:00", "2025-09-01", "Monday", "Gym A")
+    assert manager.start_change_feed()
+    yield manager
+    manager.dispose()
+
+
+@pytest.fixture
+def other(database_url):
+    """A second connection writing behind the manager's back"""
+    engine = create_engine(database_url)
+    yield engine
+    engine.dispose()
+
+
+@requires_postgres
+def test_writes_from_another_connection_invalidate_caches_and_indexes(db, other):
+    assert db.get_equipment_item_by_id("band1").available is True
+    assert db.get_available_by_type("Resistance band") == ["band1"]
+    assert len(db.get_event_on_date("2025-09-01")) == 1
+
+    with other.begin() as connection:
+        connection.execute(text('UPDATE "Equipment_Items" SET available = false WHERE id = :id'), {"id": "band1"})
+        connection.execute(text(
+            'INSERT INTO "Schedule" (event_name, time, date, day_of_week, place) '
+            "VALUES ('Spin', '18:00:00', '2025-09-01', 'Monday', 'Gym B')"
+        ))
+
+    eventually(lambda: db.get_equipment_item_by_id("band1").available is False)
+    eventually(lambda: db.get_available_by_type("Resistance band") == [])
+    eventually(lambda: len(db.get_event_on_date("2025-09-01")) == 2)
+
+    with other.begin() as connection:
+        connection.execute(text('DELETE FROM "Schedule" WHERE event_name = :name'), {"name": "Yoga"})
+    eventually(lambda: [row.event_name for row in db.get_event_on_date("2025-09-01").values()] == ["Spin"])
+
+
+@requires_postgres
+def test_reconnect_sends_resync_and_reloads(db, other):
+    db.change_feed.reconnect_delay = 0.1
+    events = []
+    db.subscribe(lambda event: events.append(event["op"]))
+    assert len(db.get_event_on_date("2025-09-01")) == 1
+
+    with other.begin() as connection:
+        pids = connection.execute(text(
+            "SELECT pg_terminate_backend(pid) FROM pg_stat_activity "
+            "WHERE pid <> pg_backend_pid() AND query LIKE 'LISTEN%'"
+        )).scalars().all()
+        # Likely committed while the listener is down, then only the resync picks it up
+        connection.execute(text(
+            'INSERT INTO "Schedule" (event_name, time, date, day_of_week, place) '
+            "VALUES ('Spin', '18:00:00', '2025-09-01', 'Monday', 'Gym B')"
+        ))
+    assert pids == [True]
+
+    eventually(lambda: "RESYNC" in events)
+    eventually(lambda: db.change_feed.connected)
+    assert len(db.get_event_on_date("2025-09-01")) == 2
+
+
+def test_change_feed_dispatch_filters_tables_and_isolates_failures():
+    feed = ChangeFeed(connect=None, channel="test")
+    received = []
+    feed.subscribe(lambda event: received.append(("all", event["op"])))
+    feed.subscribe(lambda event: received.append(("schedule", event["op"])), tables=["Schedule"])
+    feed.subscribe(lambda event: 1 / 0)
+    feed._dispatch({"table": "Equipment_Items", "op": "UPDATE", "row": {}})
+    feed._dispatch({"table": None, "op": "RESYNC", "row": None})
+    assert received == [("all", "UPDATE"), ("all", "RESYNC"), ("schedule", "RESYNC")]
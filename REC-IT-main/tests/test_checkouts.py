@@ -0,0 +1,74 @@
+"""
+Atomic equipment checkout and checkin, from racing kiosks
+"""
+
+import threading
+
+import pytest
+
+from conftest import requires_postgres
+from sandbox_api_connections import DatabaseManager
+
+pytestmark = requires_postgres
+
+
+@pytest.fixture
+def db(database_url):
+    manager = DatabaseManager(database_url=database_url)
+    manager.create_tables()
+    manager.migrate_transaction_id_sequence()
+    manager.add_equipment_item("band1", "Resistance band")
+    yield manager
+    manager.dispose()
+
+
+def race(count, fn):
+    """Call fn(i) from count threads released together, returning each call's result or error"""
+    barrier = threading.Barrier(count)
+    outcomes = [None] * count
+
+    def run(i):
+        barrier.wait()
+        try:
+            outcomes[i] = fn(i)
+        except ValueError as e:
+            outcomes[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+
+def test_only_one_of_many_concurrent_checkouts_wins(db):
+    outcomes = race(8, lambda i: db.add_equipment_checkout("band1", i))
+    winners = [outcome for outcome in outcomes if not isinstance(outcome, Exception)]
+    assert len(winners) == 1
+    assert all("not available" in str(outcome) for outcome in outcomes if isinstance(outcome, Exception))
+    assert db.get_equipment_item_by_id("band1").available is False
+    assert [row.person_id for row in db.get_equipment_checkouts_page()] == [winners[0].person_id]
+
+
+def test_double_checkout_is_rejected_until_checkin(db):
+    first = db.add_equipment_checkout("band1", 7)
+    with pytest.raises(ValueError, match="not available"):
+        db.add_equipment_checkout("band1", 8)
+    with pytest.raises(ValueError, match="does not exist"):
+        db.add_equipment_checkout("rope1", 7)
+    closed = db.checkin_equipment_item("band1")
+    assert (closed.transaction_id, closed.checkin_at is not None) == (first.transaction_id, True)
+    assert db.get_equipment_item_by_id("band1").available is True
+    with pytest.raises(ValueError, match="not currently checked out"):
+        db.checkin_equipment_item("band1")
+    assert db.add_equipment_checkout("band1", 8).transaction_id == first.transaction_id + 1
+
+
+def test_concurrent_checkins_close_the_checkout_once(db):
+    db.add_equipment_checkout("band1", 7)
+    outcomes = race(8, lambda i: db.checkin_equipment_item("band1"))
+    assert len([outcome for outcome in outcomes if not isinstance(outcome, Exception)]) == 1
+    assert all("not currently checked out" in str(outcome) for outcome in outcomes if isinstance(outcome, Exception))
+    assert db.get_equipment_item_by_id("band1").available is True
+    assert [row.checkin_at is not None for row in db.get_equipment_checkouts_page()] == [True]
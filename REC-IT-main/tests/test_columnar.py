@@ -0,0 +1,81 @@
+"""
+Columnar results of query_table: the COPY path must decode to the same values as row mode
+"""
+
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import text
+
+from conftest import requires_postgres
+from sandbox_api_connections import DatabaseManager
+
+pytestmark = requires_postgres
+
+pyarrow = pytest.importorskip("pyarrow")
+
+
+@pytest.fixture
+def db(database_url):
+    manager = DatabaseManager(database_url=database_url)
+    with manager.engine.begin() as connection:
+        # Not UTC, so timestamptz values are written in a zone the COPY path has to undo
+        connection.execute(text(f"ALTER DATABASE {manager.engine.url.database} SET timezone = 'America/New_York'"))
+        connection.execute(text("""
+            CREATE TABLE "Samples" (
+                id integer PRIMARY KEY, small smallint, big bigint, flag boolean, label text,
+                price numeric(10, 2), ratio numeric, score real, weight double precision,
+                day date, at time, seen_at timestamp, logged_at timestamptz
+            )
+        """))
+        connection.execute(text("""
+            INSERT INTO "Samples" VALUES
+                (1, 7, 9000000000, true, 'plain', 12.50, 1.000000000000000000000000000000000000001, 1.5, 0.25,
+                 '2025-09-01', '10:30:00', '2025-09-01 10:30:00', '2025-09-01 10:30:00+02'),
+                (2, -1, 0, false, 'comma, "quote" and
+            newline', -0.01, 3, -2.25, 1e300, '1999-12-31', '23:59:59.5', '1999-12-31 23:59:59.5',
+                 '2025-01-01 00:00:00-08'),
+                (3, NULL, NULL, NULL, '', NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL),
+                (4, NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL)
+        """))
+    manager.engine.dispose()
+    yield manager
+    manager.dispose()
+
+
+def test_arrow_values_match_row_mode(db):
+    rows = db.query_table("Samples", order_by="id")
+    table = db.query_table("Samples", order_by="id", result_format="arrow")
+    assert table.column_names == list(rows[0]._fields)
+    assert table.schema.field("logged_at").type == pyarrow.timestamp("us", tz="UTC")
+    assert table.schema.field("price").type == pyarrow.decimal128(10, 2)
+    for row, record in zip(rows, table.to_pylist()):
+        expected = row._asdict()
+        # Unconstrained NUMERIC stays a string so no digit is lost
+        if expected["ratio"] is not None:
+            expected["ratio"] = str(expected["ratio"])
+        assert record == expected
+    assert table.column("logged_at")[0].as_py() == datetime(2025, 9, 1, 8, 30, tzinfo=timezone.utc)
+
+
+def test_numpy_and_pandas_match_row_mode(db):
+    rows = db.query_table("Samples", where_clause="id <= :id", params={"id": 2}, order_by="id")
+    arrays = db.query_table("Samples", where_clause="id <= :id", params={"id": 2}, order_by="id",
+                            result_format="numpy")
+    assert arrays["id"].tolist() == [row.id for row in rows]
+    assert arrays["weight"].tolist() == [row.weight for row in rows]
+    assert arrays["label"].tolist() == [row.label for row in rows]
+    assert [Decimal(value) for value in arrays["price"]] == [row.price for row in rows]
+    frame = db.query_table("Samples", where_clause="id <= :id", params={"id": 2}, order_by="id",
+                           result_format="pandas")
+    assert list(frame.columns) == list(rows[0]._fields)
+    assert [value.to_pydatetime() for value in frame["logged_at"]] == [row.logged_at for row in rows]
+    assert frame["flag"].tolist() == [row.flag for row in rows]
+
+
+def test_empty_result_keeps_the_column_types(db):
+    table = db.query_table("Samples", where_clause="id < 0", result_format="arrow")
+    assert table.num_rows == 0
+    assert table.schema.field("day").type == pyarrow.date32()
+    assert table.schema.field("logged_at").type == pyarrow.timestamp("us", tz="UTC")
@@ -0,0 +1,144 @@
+"""
+KioskJournal: local checks, idempotent sync and retry after failures, against a fake manager and a local Postgres
+"""
+
+import pytest
+from sqlalchemy import text
+
+from conftest import requires_postgres
+from sandbox_api_connections import DatabaseManager, EquipmentItem, KioskJournal
+
+
+class FakeDatabase:
+    """Applies kiosk ops to an in-memory item table the way DatabaseManager.apply_kiosk_ops() does"""
+
+    EQUIPMENT_ITEMS_TABLE = "Equipment_Items"
+
+    def __init__(self, items):
+        self.items = {item.id: item for item in items}
+        self.seen = {}
+        self.offline = False
+        # Equipment IDs whose ops raise, e.g. on a lock timeout
+        self.failing = set()
+        self.calls = 0
+
+    def query_table(self, table_name):
+        return None if self.offline else list(self.items.values())
+
+    def apply_kiosk_ops(self, ops):
+        self.calls += 1
+        if self.offline:
+            raise ConnectionError("network down")
+        results = {}
+        for op in ops:
+            if op["equipment_id"] in self.failing:
+                break
+            if op["op_id"] not in self.seen:
+                item = self.items[op["equipment_id"]]
+                applies = item.available == (op["kind"] == "checkout")
+                if applies:
+                    item.available = op["kind"] == "checkin"
+                self.seen[op["op_id"]] = "applied" if applies else "rejected"
+            results[op["op_id"]] = self.seen[op["op_id"]]
+        return results
+
+
+@pytest.fixture
+def desk(tmp_path):
+    db = FakeDatabase([EquipmentItem("band1", "Resistance band", True), EquipmentItem("ball1", "Medicine ball", True)])
+    journal = KioskJournal(db, path=str(tmp_path / "journal.sqlite3"), batch_size=2)
+    assert journal.refresh_availability()
+    yield db, journal
+    journal.close()
+
+
+def test_desk_checks_answer_from_the_local_copy(desk):
+    db, journal = desk
+    journal.checkout("band1", 7)
+    assert journal.is_available("band1") is False
+    with pytest.raises(ValueError, match="not available"):
+        journal.checkout("band1", 8)
+    with pytest.raises(ValueError, match="not currently checked out"):
+        journal.checkin("ball1")
+    with pytest.raises(ValueError, match="does not exist"):
+        journal.checkout("rope1", 7)
+    assert journal.pending_count() == 1
+    assert db.calls == 0
+
+
+def test_sync_sends_batches_in_order_and_retries_after_a_network_failure(desk):
+    db, journal = desk
+    journal.checkout("band1", 7)
+    journal.checkin("band1")
+    journal.checkout("band1", 8)
+    db.offline = True
+    assert journal.sync() == {"applied": 0, "rejected": 0, "pending": 3}
+    db.offline = False
+    assert journal.sync() == {"applied": 3, "rejected": 0, "pending": 0}
+    assert db.items["band1"].available is False
+    assert journal.sync() == {"applied": 0, "rejected": 0, "pending": 0}
+
+
+def test_ops_rejected_by_the_database_are_kept(desk):
+    db, journal = desk
+    journal.checkout("ball1", 7)
+    # Another desk took the item while this one was offline
+    db.items["ball1"].available = False
+    assert journal.sync() == {"applied": 0, "rejected": 1, "pending": 0}
+    rejected = journal.get_rejected_ops()
+    assert [(row["equipment_id"], row["result"]) for row in rejected] == [("ball1", "rejected")]
+    assert journal.is_available("ball1") is False
+
+
+def test_refresh_replays_pending_entries_on_the_new_copy(desk):
+    db, journal = desk
+    journal.checkout("band1", 7)
+    db.items["ball1"].available = False
+    assert journal.refresh_availability()
+    assert journal.is_available("band1") is False
+    assert journal.is_available("ball1") is False
+    db.offline = True
+    assert journal.refresh_availability() is False
+
+
+def test_failed_ops_stay_pending_and_keep_their_order(desk):
+    db, journal = desk
+    journal.checkout("ball1", 7)
+    journal.checkout("band1", 7)
+    journal.checkin("band1")
+    db.failing.add("band1")
+    assert journal.sync() == {"applied": 1, "rejected": 0, "pending": 2}
+    assert journal.get_rejected_ops() == []
+    db.failing.clear()
+    assert journal.sync() == {"applied": 2, "rejected": 0, "pending": 0}
+    assert db.items["band1"].available is True
+
+
+@requires_postgres
+def test_op_raising_in_the_database_stays_pending(database_url, tmp_path):
+    db = DatabaseManager(database_url=database_url)
+    db.create_tables()
+    db.migrate_transaction_id_sequence()
+    db.add_equipment_item("band1", "Resistance band")
+    db.add_equipment_item("ball1", "Medicine ball")
+    with db.engine.begin() as connection:
+        connection.execute(text(f"ALTER DATABASE {db.engine.url.database} SET lock_timeout = '200ms'"))
+    db.engine.dispose()
+    journal = KioskJournal(db, path=str(tmp_path / "journal.sqlite3"))
+    try:
+        assert journal.refresh_availability()
+        journal.checkout("ball1", 7)
+        journal.checkout("band1", 7)
+        journal.checkin("band1")
+        # Another session holds the item's row, so the checkout hits the lock timeout
+        with db.engine.connect() as blocker:
+            blocker.execute(text('SELECT 1 FROM "Equipment_Items" WHERE id = \'band1\' FOR UPDATE'))
+            assert journal.sync() == {"applied": 1, "rejected": 0, "pending": 2}
+            blocker.rollback()
+        assert journal.get_rejected_ops() == []
+        assert journal.sync() == {"applied": 2, "rejected": 0, "pending": 0}
+        assert db.get_equipment_item_by_id("band1").available is True
+        assert db.get_equipment_item_by_id("ball1").available is False
+    finally:
+        journal.close()
+        db.dispose()
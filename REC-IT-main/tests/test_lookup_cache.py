@@ -0,0 +1,57 @@
+"""
+LookupCache, and its invalidation by the write paths of DatabaseManager
+"""
+
+import pytest
+
+from conftest import requires_postgres
+from sandbox_api_connections import DatabaseManager, LookupCache
+
+
+def test_lookup_cache_expires_evicts_and_hands_out_copies(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("sandbox_api_connections.time.monotonic", lambda: now[0])
+    cache = LookupCache(max_size=2, ttl=10)
+    cache.set(1, {"name": "Ada"})
+    cache.set(2, {"name": "Alan"})
+    cache.get(1)["name"] = "Changed"
+    assert cache.get(1) == {"name": "Ada"}
+    # 2 is now the least recently used entry
+    cache.set(3, {"name": "Grace"})
+    assert cache.get(2) is None
+    now[0] += 10
+    assert cache.get(1) is None
+    assert cache.stats() == {"size": 1, "hits": 2, "misses": 2, "evictions": 1, "hit_ratio": 0.5}
+
+
+@requires_postgres
+def test_writes_invalidate_the_cached_rows(database_url):
+    db = DatabaseManager(database_url=database_url, cache_ttl=300)
+    db.create_tables()
+    db.migrate_transaction_id_sequence()
+    db.add_user(1, "Ada", "Lovelace")
+    db.add_equipment_item("band1", "Resistance band")
+    try:
+        assert db.get_user_by_id(1).verified is True
+        assert db.get_equipment_item_by_id("band1").available is True
+        assert db.get_user_by_id(1).verified is True
+        assert db.get_cache_stats()[db.USERS_TABLE]["hits"] == 1
+
+        db.toggle_user_verified(1)
+        assert db.get_user_by_id(1).verified is False
+        db.add_equipment_checkout("band1", 1)
+        assert db.get_equipment_item_by_id("band1").available is False
+        db.checkin_equipment_item("band1")
+        assert db.get_equipment_item_by_id("band1").available is True
+        db.toggle_equipment_availability("band1")
+        assert db.get_equipment_item_by_id("band1").available is False
+
+        # A write in a rolled back batch leaves no trace in the cache
+        with pytest.raises(RuntimeError, match="rolled back"):
+            with db.batch():
+                db.toggle_user_verified(1)
+                assert db.get_user_by_id(1).verified is True
+                db.add_user(1, "Duplicate", "Key")
+        assert db.get_user_by_id(1).verified is False
+    finally:
+        db.dispose()
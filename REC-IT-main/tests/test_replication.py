@@ -0,0 +1,156 @@
+"""
+Read replica routing of DatabaseManager against a local primary and a pg_basebackup standby
+"""
+
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine, make_url, text
+
+from conftest import create_database, requires_local_postgres
+from sandbox_api_connections import DatabaseManager
+from sandbox_benchmarks import LocalPostgres
+
+pytestmark = requires_local_postgres
+
+
+@pytest.fixture(scope="module")
+def standby(postgres):
+    """Hot standby streaming from the session cluster"""
+    with LocalPostgres(standby_of=postgres) as cluster:
+        yield cluster
+
+
+@pytest.fixture
+def db(postgres, standby):
+    """Manager with an empty database on the primary and its replica on the standby"""
+    primary_url = create_database(postgres)
+    replica_url = make_url(primary_url).set(port=standby.port).render_as_string(hide_password=False)
+    manager = DatabaseManager(
+        database_url=primary_url, replica_url=replica_url, max_replica_lag=60.0,
+        replica_lag_check_interval=0, read_after_write_window=0.5,
+    )
+    _run_elsewhere(manager.create_tables)
+    wait_for_replay(manager)
+    yield manager
+    manager.dispose()
+
+
+def _run_elsewhere(fn):
+    """Call fn in another thread, so its writes do not pin this thread's reads to the primary"""
+    result = []
+    thread = threading.Thread(target=lambda: result.append(fn()))
+    thread.start()
+    thread.join()
+    return result[0] if result else None
+
+
+def wait_for_replay(db, timeout=10):
+    """Wait until the replica has replayed everything the primary has written so far"""
+    with db.engine.connect() as connection:
+        target = connection.execute(text("SELECT pg_current_wal_lsn()")).scalar()
+    # The test database itself may not have been replayed yet, so poll from the maintenance database
+    engine = create_engine(db.replica_engine.url.set(database="postgres"))
+    try:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with engine.connect() as connection:
+                statement = text("SELECT pg_last_wal_replay_lsn() >= :target")
+                if connection.execute(statement, {"target": target}).scalar():
+                    return
+            time.sleep(0.05)
+    finally:
+        engine.dispose()
+    raise TimeoutError("the replica did not catch up")
+
+
+def served_by(db):
+    """Name the server a read in this thread goes to right now"""
+    with db._connect(read_only=True) as connection:
+        in_recovery = connection.execute(text("SELECT pg_is_in_recovery()")).scalar()
+    return "replica" if in_recovery else "primary"
+
+
+def _on_standby(db, *statements):
+    """Run statements on the standby outside a transaction, returning their first values"""
+    engine = create_engine(db.replica_engine.url, isolation_level="AUTOCOMMIT")
+    try:
+        with engine.connect() as connection:
+            results = [connection.exec_driver_sql(statement) for statement in statements]
+            return [result.scalar() if result.returns_rows else None for result in results]
+    finally:
+        engine.dispose()
+
+
+def test_reads_go_to_a_caught_up_replica(db):
+    assert db.get_replica_lag() == 0
+    assert served_by(db) == "replica"
+    with db.on_primary():
+        assert served_by(db) == "primary"
+    assert served_by(db) == "replica"
+
+
+def test_reads_follow_own_writes_to_the_primary(db):
+    _on_standby(db, "SELECT pg_wal_replay_pause()")
+    try:
+        db.add_user(1, "Ada", "Lovelace")
+        assert served_by(db) == "primary"
+        assert db.get_user_by_id(1).user_first_name == "Ada"
+        # Another thread has not written, so it reads the paused replica
+        assert _run_elsewhere(lambda: served_by(db)) == "replica"
+        assert _run_elsewhere(lambda: db.get_user_by_id(1)) is None
+        time.sleep(db.read_after_write_window)
+        assert served_by(db) == "replica"
+    finally:
+        _on_standby(db, "SELECT pg_wal_replay_resume()")
+
+
+def test_write_inside_on_primary_keeps_reads_on_the_primary(db):
+    with db.on_primary():
+        db.add_user(2, "Grace", "Hopper")
+    assert served_by(db) == "primary"
+    time.sleep(db.read_after_write_window)
+    assert served_by(db) == "replica"
+
+
+def test_lagging_replica_falls_back_to_the_primary(db):
+    db.max_replica_lag = 0.5
+    _on_standby(db, "SELECT pg_wal_replay_pause()")
+    try:
+        _run_elsewhere(lambda: db.add_user(3, "Alan", "Turing"))
+        time.sleep(1.0)
+        assert db.get_replica_lag() > db.max_replica_lag
+        assert served_by(db) == "primary"
+        assert db.get_user_by_id(3).user_first_name == "Alan"
+    finally:
+        _on_standby(db, "SELECT pg_wal_replay_resume()")
+    wait_for_replay(db)
+    assert db.get_replica_lag() == 0
+    assert served_by(db) == "replica"
+
+
+def test_disconnected_replica_falls_back_to_the_primary(db):
+    conninfo, = _on_standby(db, "SHOW primary_conninfo")
+    _on_standby(db, "ALTER SYSTEM SET primary_conninfo = ''", "SELECT pg_reload_conf()")
+    try:
+        deadline = time.monotonic() + 10
+        while db.get_replica_lag() is not None and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert db.get_replica_lag() is None
+        assert served_by(db) == "primary"
+    finally:
+        quoted = conninfo.replace("'", "''")
+        _on_standby(db, f"ALTER SYSTEM SET primary_conninfo = '{quoted}'", "SELECT pg_reload_conf()")
+    wait_for_replay(db)
+    assert served_by(db) == "replica"
+
+
+def test_user_trie_loads_from_the_primary(db):
+    _on_standby(db, "SELECT pg_wal_replay_pause()")
+    try:
+        _run_elsewhere(lambda: db.add_user(4, "Edsger", "Dijkstra"))
+        assert served_by(db) == "replica"
+        assert [user.id for user in db.load_user_trie().search("Edsger")] == [4]
+    finally:
+        _on_standby(db, "SELECT pg_wal_replay_resume()")
@@ -0,0 +1,101 @@
+"""
+Double-booking detection: IntervalTree, ScheduleIndex.conflicts() and the opt-in checks of both managers
+"""
+
+import asyncio
+from datetime import date, time, timedelta
+
+import pytest
+from sqlalchemy import make_url
+
+from conftest import requires_postgres
+from sandbox_api_connections import AsyncDatabaseManager, DatabaseManager, IntervalTree, ScheduleIndex, ScheduleEvent
+
+
+def event(id, start, day, place="Gym A", recurs_until=None, weekly=False):
+    return ScheduleEvent(id, f"Event {id}", start, day, day.strftime("%A"), place, weekly, recurs_until, None, None)
+
+
+def test_interval_tree_overlap_and_stabbing():
+    tree = IntervalTree([(1, 3, "a"), (2, 8, "b"), (5, 6, "c"), (9, 9, "d")])
+    assert sorted(tree.overlapping(3, 5)) == ["a", "b", "c"]
+    assert sorted(tree.at(2)) == ["a", "b"]
+    assert tree.at(9) == ["d"]
+    assert tree.overlapping(10, 12) == []
+    assert IntervalTree([]).overlapping(0, 1) == []
+
+
+def test_interval_tree_matches_brute_force():
+    intervals = [(start, start + length, start * 10 + length) for start in range(30) for length in (0, 3, 11)]
+    tree = IntervalTree(intervals)
+    for low in range(-2, 45, 3):
+        for high in (low, low + 4):
+            expected = sorted(value for start, end, value in intervals if start <= high and low <= end)
+            assert sorted(tree.overlapping(low, high)) == expected
+
+
+def test_schedule_index_conflicts():
+    monday = date(2025, 9, 1)
+    index = ScheduleIndex([
+        event(1, time(10), monday, weekly=True, recurs_until=date(2025, 12, 15)),
+        event(2, time(18), monday),
+        event(3, time(10), monday + timedelta(days=1)),
+        event(4, time(10), monday, place="Pool"),
+    ])
+    duration = timedelta(hours=1)
+    # Meets the series on a later Monday, at the same place written differently
+    candidate = event(5, time(10, 30), monday + timedelta(weeks=3), place=" gym a ")
+    assert [row.id for row in index.conflicts(candidate, duration)] == [1]
+    assert index.conflicts(event(5, time(11), monday + timedelta(weeks=3)), duration) == []
+    assert index.conflicts(event(5, time(10), date(2025, 12, 22)), duration) == []
+    assert index.conflicts(event(5, time(10), monday, place=None), duration) == []
+    # An indexed event does not conflict with itself
+    assert index.conflicts(index.events[2], duration) == []
+    assert [conflict["event_ids"] for conflict in index.all_conflicts(duration)] == []
+    index.add(event(6, time(10, 45), monday + timedelta(weeks=1)))
+    assert [conflict["event_ids"] for conflict in index.all_conflicts(duration)] == [[1, 6]]
+
+
+@requires_postgres
+def test_conflict_rejection_is_opt_in(database_url):
+    db = DatabaseManager(database_url=database_url)
+    db.create_tables()
+    first = db.add_schedule_event("Yoga", "10:00:00", "2025-09-01", "Monday", "Gym A", True, "2025-12-15")
+    # Conflicting events are still added unless the caller asks for the check
+    second = db.add_schedule_event("Spin", "10:30:00", "2025-09-15", "Monday", "Gym A")
+    assert second is not None
+    assert [row.id for row in db.get_event_conflicts(second)] == [first.id]
+    assert db.get_event_conflicts(second, duration=timedelta(minutes=20)) == []
+    with pytest.raises(ValueError, match="Yoga"):
+        db.add_schedule_event("Boxing", "10:15:00", "2025-09-22", "Monday", "gym a", check_conflicts=True)
+    assert db.add_schedule_event("Boxing", "10:15:00", "2025-09-22", "Monday", "Pool", check_conflicts=True)
+    with pytest.raises(ValueError, match="Yoga"):
+        db.update_schedule_event(second.id, new_time="09:30:00", check_conflicts=True)
+    db.update_schedule_event(second.id, new_time="12:00:00", check_conflicts=True)
+    db.dispose()
+
+
+@requires_postgres
+def test_async_manager_checks_conflicts_the_same_way(database_url):
+    db = DatabaseManager(database_url=database_url)
+    db.create_tables()
+    first = db.add_schedule_event("Yoga", "10:00:00", "2025-09-01", "Monday", "Gym A", True, "2025-12-15")
+    db.dispose()
+    async_url = make_url(database_url).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+    async def scenario():
+        async_db = AsyncDatabaseManager(database_url=async_url)
+        try:
+            spin = await async_db.add_schedule_event("Spin", "10:30:00", "2025-09-15", "Monday", "Gym A")
+            with pytest.raises(ValueError, match="Yoga"):
+                await async_db.add_schedule_event("Boxing", "10:15:00", "2025-09-22", "Monday", "Gym A",
+                                                  check_conflicts=True)
+            assert [row.id for row in await async_db.get_event_conflicts(spin)] == [first.id]
+            with pytest.raises(ValueError, match="Yoga"):
+                await async_db.update_schedule_event(spin.id, new_time="09:30:00", check_conflicts=True)
+            await async_db.update_schedule_event(spin.id, new_time="12:00:00", check_conflicts=True)
+            assert await async_db.get_event_conflicts(await async_db.get_event_by_id(spin.id)) == []
+        finally:
+            await async_db.dispose()
+
+    asyncio.run(scenario())
@@ -0,0 +1,78 @@
+"""
+ScheduleIndex: weekly recurrence expansion behind get_event_on_date() and get_events_between()
+"""
+
+import asyncio
+from datetime import date, time
+
+from sqlalchemy import make_url
+
+from conftest import requires_postgres
+from sandbox_api_connections import AsyncDatabaseManager, DatabaseManager, ScheduleEvent, ScheduleIndex
+
+
+def event(id, day, weekly=False, recurs_until=None):
+    return ScheduleEvent(id, f"Event {id}", time(10), day, day.strftime("%A"), "Gym A", weekly, recurs_until, None, None)
+
+
+def test_schedule_index_expands_weekly_recurrences():
+    index = ScheduleIndex([
+        event(1, date(2025, 9, 1), weekly=True, recurs_until=date(2025, 9, 29)),
+        event(2, date(2025, 9, 3)),
+        event(3, date(2025, 9, 8), weekly=True),
+    ])
+    assert sorted(row.id for row in index.events_on(date(2025, 9, 15))) == [1, 3]
+    assert [row.id for row in index.events_on(date(2025, 10, 6))] == [3]
+    assert index.events_on(date(2025, 9, 16)) == []
+    days = index.occurrences_between(date(2025, 9, 1), date(2025, 9, 10))
+    assert {day: sorted(row.id for row in rows) for day, rows in days.items()} == {
+        date(2025, 9, 1): [1], date(2025, 9, 3): [2], date(2025, 9, 8): [1, 3],
+    }
+    assert list(ScheduleIndex.expand_weekly(date(2025, 9, 1), date(2025, 9, 29), date(2025, 9, 10), date.max)) == [
+        date(2025, 9, 15), date(2025, 9, 22), date(2025, 9, 29),
+    ]
+
+
+def test_schedule_index_add_and_remove_replace_rows():
+    index = ScheduleIndex([event(1, date(2025, 9, 1))])
+    index.add(event(1, date(2025, 9, 2)))
+    assert index.events_on(date(2025, 9, 1)) == []
+    assert [row.id for row in index.events_on(date(2025, 9, 2))] == [1]
+    index.remove(1)
+    index.remove(42)
+    assert index.events_on(date(2025, 9, 2)) == []
+
+
+def test_schedule_index_hands_out_copies():
+    index = ScheduleIndex([event(1, date(2025, 9, 1))])
+    index.events_on(date(2025, 9, 1))[0].place = "Pool"
+    assert index.events[1].place == "Gym A"
+
+
+@requires_postgres
+def test_sync_and_async_managers_agree_on_the_events_of_a_day(database_url):
+    db = DatabaseManager(database_url=database_url)
+    db.create_tables()
+    async_url = make_url(database_url).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+    async def scenario():
+        async_db = AsyncDatabaseManager(database_url=async_url)
+        try:
+            series = await async_db.add_schedule_event("Yoga", "10:00:00", "2025-09-01", "Monday", "Gym A",
+                                                       True, "2025-09-29")
+            assert isinstance(series, ScheduleEvent) and series.recurs_weekly
+            await async_db.add_schedule_event("Spin", "18:00:00", "2025-09-15", "Monday", "Gym B")
+            await async_db.add_schedule_event("Swim", "07:00:00", "2025-09-02", "Tuesday", "Pool", True)
+            return {day: await async_db.get_event_on_date(day)
+                    for day in ("2025-09-01", "2025-09-15", "2025-09-16", "2025-10-06", "2025-09-17")}
+        finally:
+            await async_db.dispose()
+
+    async_days = asyncio.run(scenario())
+    for day, events in async_days.items():
+        assert events == db.get_event_on_date(day)
+    assert sorted(event.event_name for event in async_days["2025-09-15"].values()) == ["Spin", "Yoga"]
+    assert [event.event_name for event in async_days["2025-09-16"].values()] == ["Swim"]
+    assert async_days["2025-10-06"] is None
+    assert async_days["2025-09-17"] is None
+    db.dispose()
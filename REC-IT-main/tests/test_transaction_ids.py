@@ -0,0 +1,60 @@
+"""
+Transaction IDs from the Equipment_Checkouts sequence
+"""
+
+import asyncio
+
+import pytest
+from sqlalchemy import make_url, text
+
+from conftest import requires_postgres
+from sandbox_api_connections import AsyncDatabaseManager, DatabaseManager
+
+pytestmark = requires_postgres
+
+
+@pytest.fixture
+def db(database_url):
+    manager = DatabaseManager(database_url=database_url)
+    manager.create_tables()
+    manager.add_equipment_item("band1", "Resistance band")
+    yield manager
+    manager.dispose()
+
+
+def _sequence_exists(db):
+    with db.engine.connect() as connection:
+        return connection.execute(db._sequence_exists_statement()).scalar()
+
+
+def test_checkout_without_the_migration_raises_and_runs_no_ddl(db, database_url):
+    with pytest.raises(RuntimeError, match="migrate_transaction_id_sequence"):
+        db.add_equipment_checkout("band1", 7)
+    with pytest.raises(RuntimeError, match="migrate_transaction_id_sequence"):
+        db.allocate_transaction_ids(3)
+    async_url = make_url(database_url).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+    async def async_checkout():
+        async_db = AsyncDatabaseManager(database_url=async_url)
+        try:
+            await async_db.add_equipment_checkout("band1", 7)
+        finally:
+            await async_db.dispose()
+
+    with pytest.raises(RuntimeError, match="migrate_transaction_id_sequence"):
+        asyncio.run(async_checkout())
+    assert not _sequence_exists(db)
+    assert db.get_equipment_item_by_id("band1").available is True
+
+
+def test_ids_come_from_the_sequence_after_the_migration(db):
+    with db._begin() as connection:
+        connection.execute(text(
+            'INSERT INTO "Equipment_Checkouts" (equipment_id, person_id, checkout_at, checkin_at, transaction_id) '
+            "VALUES ('band1', 1, now(), now(), 41)"
+        ))
+    db.migrate_transaction_id_sequence()
+    db.migrate_transaction_id_sequence()
+    assert _sequence_exists(db)
+    assert db.add_equipment_checkout("band1", 7).transaction_id == 42
+    assert db.allocate_transaction_ids(3) == [43, 44, 45]
@@ -0,0 +1,65 @@
+"""
+User name search: the in-memory NameTrie, and search_users through it and through the database
+"""
+
+from conftest import requires_postgres
+from sandbox_api_connections import DatabaseManager, NameTrie, User
+
+
+def user(id, first, last):
+    return User(id, first, last, True, None)
+
+
+def test_name_trie_prefix_search():
+    trie = NameTrie([user(1, "Ada", "Lovelace"), user(2, "Alan", "Turing"), user(3, "Grace", "Hopper")])
+    assert [row.id for row in trie.search("a")] == [1, 2]
+    assert [row.id for row in trie.search("LOVE")] == [1]
+    assert [row.id for row in trie.search("ada lo")] == [1]
+    assert [row.id for row in trie.search("a", limit=1)] == [1]
+    assert trie.search("z") == []
+
+
+def test_name_trie_update_and_remove():
+    trie = NameTrie([user(1, "Ada", "Lovelace")])
+    trie.add(user(1, "Ada", "Byron"))
+    assert trie.search("love") == []
+    assert [row.user_last_name for row in trie.search("byr")] == ["Byron"]
+    trie.remove(1)
+    assert trie.search("ada") == []
+    # Empty branches are pruned
+    assert trie._root == {}
+
+
+def test_name_trie_hands_out_copies():
+    trie = NameTrie([user(1, "Ada", "Lovelace")])
+    trie.search("ada")[0].verified = False
+    assert trie.users[1].verified is True
+
+
+@requires_postgres
+def test_search_users_in_memory_and_in_the_database(database_url):
+    db = DatabaseManager(database_url=database_url)
+    db.create_tables()
+    db.apply_migrations()
+    db.add_users_bulk([(1, "Ada", "Lovelace"), (2, "Alan", "Turing"), (3, "Grace", "Hopper"), (4, "Adam", "Smith")])
+    try:
+        # Prefixes of a first, last or full name match both ways, the database ranks them before fuzzy matches
+        for query in ("ada", "AL", "hop", "ada lo"):
+            in_memory = [user.id for user in db.search_users(query, in_memory=True)]
+            in_database = [user.id for user in db.search_users(query)]
+            assert sorted(in_database[:len(in_memory)]) == sorted(in_memory)
+        assert [user.id for user in db.search_users("ada lo")] == [1, 4]
+        assert [user.id for user in db.search_users("ada lo", in_memory=True)] == [1]
+        assert [user.id for user in db.search_users("ada", limit=1)] == [1]
+        # Only the trigram search matches inside a name and forgives typos
+        assert db.search_users("ring", in_memory=True) == []
+        assert [user.id for user in db.search_users("ring")] == [2]
+        assert db.search_users("lovelase", in_memory=True) == []
+        assert [user.id for user in db.search_users("lovelase")] == [1]
+        # The trie follows writes made through the manager
+        db.add_user(5, "Edsger", "Dijkstra")
+        db.toggle_user_verified(1)
+        assert [user.id for user in db.search_users("dijk", in_memory=True)] == [5]
+        assert [user.verified for user in db.search_users("lovelace", in_memory=True)] == [False]
+    finally:
+        db.dispose()
@@ -0,0 +1,107 @@
+"""
+WriteBatch queueing and DatabaseManager.batch() units of work
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import text
+
+from conftest import requires_postgres
+from sandbox_api_connections import DatabaseManager, WriteBatch
+
+
+class FakeConnection:
+    """Records executemany calls instead of talking to a database"""
+
+    def __init__(self, fail_on=None):
+        self.dialect = SimpleNamespace(driver="fake")
+        self.executed = []
+        self.fail_on = fail_on
+
+    def execute(self, statement, params):
+        if statement is self.fail_on:
+            raise RuntimeError("rejected")
+        self.executed.append((statement, params))
+
+
+def test_flush_sends_one_executemany_per_run_of_identical_statements():
+    connection = FakeConnection()
+    batch = WriteBatch(SimpleNamespace(metrics=None), connection)
+    insert, update = text("INSERT"), text("UPDATE")
+    for params in ({"id": 1}, {"id": 2}):
+        batch.add(insert, params)
+    batch.add(update, {"id": 1})
+    batch.add(insert, {"id": 3})
+    assert connection.executed == []
+    batch.flush()
+    assert connection.executed == [
+        (insert, [{"id": 1}, {"id": 2}]), (update, [{"id": 1}]), (insert, [{"id": 3}]),
+    ]
+    assert batch.queue == []
+    batch.flush()
+    assert len(connection.executed) == 3
+
+
+def test_queue_flushes_at_pipeline_size(monkeypatch):
+    monkeypatch.setattr(WriteBatch, "PIPELINE_SIZE", 3)
+    connection = FakeConnection()
+    batch = WriteBatch(SimpleNamespace(metrics=None), connection)
+    insert = text("INSERT")
+    for i in range(4):
+        batch.add(insert, {"id": i})
+    assert connection.executed == [(insert, [{"id": 0}, {"id": 1}, {"id": 2}])]
+    assert batch.queue == [(insert, {"id": 3})]
+
+
+def test_flush_records_the_first_error():
+    update = text("UPDATE")
+    batch = WriteBatch(SimpleNamespace(metrics=None), FakeConnection(fail_on=update))
+    batch.add(update, {"id": 1})
+    with pytest.raises(RuntimeError):
+        batch.flush()
+    first = batch.error
+    batch.add(update, {"id": 2})
+    with pytest.raises(RuntimeError):
+        batch.flush()
+    assert batch.error is first
+
+
+@requires_postgres
+def test_batch_commits_pipelined_writes_and_rolls_back_on_rejection(database_url):
+    db = DatabaseManager(database_url=database_url)
+    db.create_tables()
+    with db.batch():
+        for i in range(3):
+            db.insert_data(db.USERS_TABLE, {"id": i, "user_first_name": f"First{i}", "user_last_name": "Last"})
+        db.update_data(db.USERS_TABLE, {"verified": False}, "id = :id", {"id": 1})
+        # Reads in the batch see its queued writes
+        assert db.get_user_by_id(1).verified is False
+    assert sorted(user.id for user in db.get_all_users()) == [0, 1, 2]
+
+    with pytest.raises(RuntimeError, match="rolled back"):
+        with db.batch():
+            db.insert_data(db.USERS_TABLE, {"id": 10, "user_first_name": "New", "user_last_name": "User"})
+            db.insert_data(db.USERS_TABLE, {"id": 0, "user_first_name": "Duplicate", "user_last_name": "Key"})
+    assert db.get_user_by_id(10) is None
+    db.dispose()
+
+
+@requires_postgres
+def test_batch_survives_errors_recovered_in_savepoints(database_url):
+    db = DatabaseManager(database_url=database_url)
+    db.create_tables()
+    db.add_user(1, "Ada", "Lovelace")
+    db.add_equipment_item("band1", "Resistance band")
+    with db.batch():
+        # The chunk fails on the duplicate and is retried row by row in savepoints
+        report = db.add_users_bulk([(1, "Dup", "Licate"), (2, "Alan", "Turing"), (3, "Grace", "Hopper")])
+        assert report["inserted"] == 2
+        assert [error["index"] for error in report["errors"]] == [0]
+        # A caught business error only undoes its own savepoint
+        with pytest.raises(ValueError, match="not currently checked out"):
+            db.checkin_equipment_item("band1")
+        db.update_data(db.USERS_TABLE, {"verified": False}, "id = :id", {"id": 2})
+    assert sorted(user.id for user in db.get_all_users()) == [1, 2, 3]
+    assert db.get_user_by_id(2).verified is False
+    db.dispose()